@@ -5,13 +5,27 @@ import sys
 
 sys.path.append(os.getcwd())
 import time
-from _ctypes import Structure
-from ctypes import c_byte, c_uint16, c_uint32
+import struct
+from socket import inet_ntoa, inet_ntop, AF_INET6
 from ios_device.servers.Instrument import  InstrumentServer
 from ios_device.util import logging
 
 log = logging.getLogger(__name__)
 
+# sockaddr_in / sockaddr_in6，端口为网络字节序
+_SA4 = struct.Struct('!BBH4s8x')
+_SA6 = struct.Struct('!BBHI16sI')
+
+
+def _fmt_sa4(buf):
+    _, _, port, addr = _SA4.unpack_from(buf)
+    return f"{inet_ntoa(addr)}:{port}"
+
+
+def _fmt_sa6(buf):
+    _, _, port, _, addr, _ = _SA6.unpack_from(buf)
+    return f"[{inet_ntop(AF_INET6, addr)}]:{port}"
+
 
 def networking(rpc):
     headers = {
@@ -28,42 +42,17 @@ def networking(rpc):
     }
 
     def on_callback_message(res):
-        from socket import inet_ntoa, htons, inet_ntop, AF_INET6
-        class SockAddr4(Structure):
-            _fields_ = [
-                ('len', c_byte),
-                ('family', c_byte),
-                ('port', c_uint16),
-                ('addr', c_byte * 4),
-                ('zero', c_byte * 8)
-            ]
-
-            def __str__(self):
-                return f"{inet_ntoa(self.addr)}:{htons(self.port)}"
-
-        class SockAddr6(Structure):
-            _fields_ = [
-                ('len', c_byte),
-                ('family', c_byte),
-                ('port', c_uint16),
-                ('flowinfo', c_uint32),
-                ('addr', c_byte * 16),
-                ('scopeid', c_uint32)
-            ]
-
-            def __str__(self):
-                return f"[{inet_ntop(AF_INET6, self.addr)}]:{htons(self.port)}"
-
         data = res.selector
         if data[0] == 1:
             if len(data[1][0]) == 16:
-                data[1][0] = str(SockAddr4.from_buffer_copy(data[1][0]))
-                data[1][1] = str(SockAddr4.from_buffer_copy(data[1][1]))
+                data[1][0] = _fmt_sa4(data[1][0])
+                data[1][1] = _fmt_sa4(data[1][1])
             elif len(data[1][0]) == 28:
-                data[1][0] = str(SockAddr6.from_buffer_copy(data[1][0]))
-                data[1][1] = str(SockAddr6.from_buffer_copy(data[1][1]))
+                data[1][0] = _fmt_sa6(data[1][0])
+                data[1][1] = _fmt_sa6(data[1][1])
 
-        print(msg_type[data[0]] + json.dumps(dict(zip(headers[data[0]], data[1]))))
+        payload = {"type": msg_type[data[0]], **dict(zip(headers[data[0]], data[1]))}
+        print(json.dumps(payload))
         # print("[data]", res.selector)
     rpc.register_channel_callback("com.apple.instruments.server.services.networking", on_callback_message)
     var = rpc.call("com.apple.instruments.server.services.networking", "replayLastRecordedSession").selector
@@ -149,6 +149,9 @@ class InstrumentsBase:
         self.lock_down = LockdownClient(udid=udid, network=network)
         self.process_attributes = None
         self.system_attributes = None
+        # bundle_id/name 解析结果缓存，避免重复枚举应用和进程列表
+        self._app_cache = {}
+        self._pid_cache = {}
 
     def __enter__(self):
         return self
@@ -160,7 +163,10 @@ class InstrumentsBase:
             self.manager_rpc.stop()
 
     def get_pid(self, bundle_id=None, name=None):
-        pid = None
+        key = (bundle_id, name)
+        pid = self._pid_cache.get(key)
+        if pid is not None:
+            return pid
         if bundle_id:
             app = self.application_listing(bundle_id)
             if app:
@@ -171,6 +177,8 @@ class InstrumentsBase:
             for p in processes:
                 if name == p.get('name'):
                     pid = p.get('pid')
+        if pid is not None:
+            self._pid_cache[key] = pid
         return pid
 
     @property
@@ -217,10 +225,13 @@ class InstrumentsBase:
                                     "launchSuspendedProcessWithDevicePath:bundleIdentifier:environment:arguments"
                                     ":options:",
                                     app_path, bundle_id, app_env, app_args, options).selector
+        # 进程集合发生变化，缓存的 pid 不再可信
+        self._pid_cache.clear()
         return pid
 
     def kill_app(self, pid):
         parsed = self.instruments.call(InstrumentsService.ProcessControl, "killPid:", str(pid)).selector
+        self._pid_cache.clear()
         return parsed
 
     def application_listing(self, bundle_id=None):
@@ -229,6 +240,8 @@ class InstrumentsBase:
             - unregisterUpdateToken:
         :return:
         """
+        if bundle_id in self._app_cache:
+            return self._app_cache[bundle_id]
         applist = self.instruments.call(InstrumentsService.ApplicationListing,
                                         "installedApplicationsMatching:registerUpdateToken:",
                                         {}, "").selector
@@ -236,6 +249,7 @@ class InstrumentsBase:
         if bundle_id:
             for app in applist:
                 if app.get('CFBundleIdentifier') == bundle_id:
+                    self._app_cache[bundle_id] = app
                     return app
         # return ret
 
@@ -1,28 +1,112 @@
 import json
+import sys
+import threading
 from pprint import pprint
 
 import click
 
+# JSON 序列化优先走 orjson/ujson 的 C 实现，未安装时退回标准库
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import ujson
+except ImportError:
+    ujson = None
+else:
+    # ujson.dumps 的 default 回调需要 5.0+
+    if int(ujson.__version__.split('.')[0]) < 5:
+        ujson = None
 
-class Enconding(json.JSONEncoder):
-    def default(self, o):
-        if isinstance(o, bytes):
-            try:
-                return o.decode()
-            except:
-                return str(o)
+
+def _json_default(o):
+    if isinstance(o, bytes):
+        try:
+            return o.decode()
+        except UnicodeDecodeError:
+            pass
+    return str(o)
+
+
+def dumps_json(buf, indent=False):
+    """ 序列化为 JSON bytes，datetime 等不可序列化类型退化为 str """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(buf, option=option, default=_json_default)
+    if ujson is not None:
+        return ujson.dumps(buf, indent=4 if indent else 0, default=_json_default).encode()
+    return json.dumps(buf, indent=4 if indent else None, default=_json_default).encode()
 
 
 def print_json(buf, format=True):
     if format == 'json':
-        formatted_json = json.dumps(buf, indent=4, cls=Enconding)
-        print(formatted_json)
+        # 直接写 bytes，避免 str 再编码一遍
+        sys.stdout.buffer.write(dumps_json(buf, indent=True))
+        sys.stdout.buffer.write(b'\n')
+        sys.stdout.buffer.flush()
     elif format == 'flush':
         print(f'\r{buf}', end='', flush=True)
     else:
         print(buf)
 
 
+class BatchedJSONWriter:
+    """ 高频流式回调的批量输出，聚合多条记录一次写出，减少 write 系统调用
+    """
+
+    def __init__(self, format=True, batch_size=16, flush_interval=0.2):
+        self.format = format
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._buffer = bytearray()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def emit(self, buf):
+        if self.format == 'flush':
+            # 覆盖式单行输出没法聚合，保持原有行为
+            print_json(buf, self.format)
+            return
+        if self.format == 'json':
+            record = dumps_json(buf, indent=True)
+        else:
+            record = str(buf).encode()
+        with self._lock:
+            self._buffer += record
+            self._buffer += b'\n'
+            self._count += 1
+            if self._count >= self.batch_size:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.flush_interval, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            sys.stdout.buffer.write(self._buffer)
+            sys.stdout.buffer.flush()
+            del self._buffer[:]
+        self._count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.flush()
+
+
 class Command(click.Command):
 
     def __init__(self, *args, **kwargs):
@@ -1,15 +1,17 @@
-import dataclasses
-import json
+import heapq
+import queue
+import struct
 import threading
 import uuid
-from copy import deepcopy
 from datetime import datetime
 from distutils.version import LooseVersion
+from itertools import islice
+from time import monotonic
 
 import click
 
 from ios_device.cli.base import InstrumentsBase
-from ios_device.cli.cli import Command, print_json
+from ios_device.cli.cli import BatchedJSONWriter, Command, dumps_json, print_json
 from ios_device.util import Log, api_util
 from ios_device.util.exceptions import InstrumentRPCParseError
 from ios_device.util.gpu_decode import JSEvn, TraceData, GRCDecodeOrder, GRCDisplayOrder
@@ -19,6 +21,13 @@ from ios_device.util.variables import LOG
 
 log = Log.getLogger(LOG.Instrument.value)
 
+# 电量数据为固定 24 字节一帧，预编译避免每帧解析格式串
+_POWER_STRUCT = struct.Struct('>ddd')
+_POWER_SIZE = _POWER_STRUCT.size
+
+# sysmontap 输出里不透传的服务端属性描述键
+_DROP_KEYS = frozenset({'SystemAttributes', 'ProcessesAttributes'})
+
 
 @click.group()
 def cli():
@@ -145,10 +154,10 @@ def cmd_network_process(udid, network, pid, name, bundle_id, format):
 def cmd_networking(udid, network, format):
     """ Print information about current network activity. """
 
-    def _callback(res):
-        api_util.network_caller(res, print_json)
+    with BatchedJSONWriter(format) as writer, InstrumentsBase(udid=udid, network=network) as rpc:
+        def _callback(res):
+            api_util.network_caller(res, writer.emit)
 
-    with InstrumentsBase(udid=udid, network=network) as rpc:
         rpc.networking(_callback)
 
 
@@ -159,73 +168,106 @@ def cmd_networking(udid, network, format):
 @click.option('-b', '--bundle_id', default=None, help='Process app bundleId to filter.Omit show all')
 @click.option('--processes', is_flag=True, help='Only output process information')
 @click.option('--sort', help='Process field sorting')
+@click.option('--top', type=click.INT, default=None, help='Only output top N process rows. Omit show all')
 @click.option('--proc_filter', help='Process param to filter split by ",". Omit show all')
 @click.option('--sys_filter', help='System param to filter split by ",". Omit show all')
-def cmd_sysmontap(udid, network, format, time, pid, name, bundle_id, processes, sort, proc_filter,
+def cmd_sysmontap(udid, network, format, time, pid, name, bundle_id, processes, sort, top, proc_filter,
                   sys_filter):
     """ Get performance data """
 
-    def on_callback_message(res):
+    writer = BatchedJSONWriter(format)
+    proc_keys = sys_keys = process_match = select_rows = None
+
+    # 高频回调里把热点全局名预绑定成默认参数，LOAD_GLOBAL 变 LOAD_FAST
+    def on_callback_message(res, _dict=dict, _zip=zip, _drop_keys=_DROP_KEYS):
         if isinstance(res.selector, list):
-            data = deepcopy(res.selector)
+            out_rows = []
             processes_data = {}
-            for index, row in enumerate(res.selector):
+            for row in res.selector:
+                out_row = {k: v for k, v in row.items() if k not in _drop_keys}
                 if 'Processes' in row:
-                    data[index]['Processes'] = {}
+                    processes_row = processes_data if processes else {}
                     for _pid, process in row['Processes'].items():
-                        process_attributes = dataclasses.make_dataclass('SystemProcessAttributes',
-                                                                        proc_filter or rpc.process_attributes)
-                        attrs = process_attributes(*process)
-                        if pid and pid != _pid:
-                            continue
-                        if name and attrs.name != name:
+                        if process_match is not None and not process_match(_pid, process):
                             continue
-                        if processes:
-                            processes_data[f'{attrs.name}'] = attrs.__dict__
-                            continue
-                        data[index]['Processes'][f'{attrs.name}'] = attrs.__dict__
-                    data[index]['Processes'] = sorted(data[index]['Processes'].items(),
-                                                      key=lambda d: d[1].get(sort, 0),
-                                                      reverse=True)
+                        row_dict = _dict(_zip(proc_keys, process))
+                        processes_row[f"{row_dict['name']}"] = row_dict
+                    if not processes:
+                        out_row['Processes'] = select_rows(processes_row.items())
 
                 if 'System' in row:
-                    if 'SystemAttributes' in data[index]:
-                        del data[index]['SystemAttributes']
-                    if 'ProcessesAttributes' in data[index]:
-                        del data[index]['ProcessesAttributes']
-                    data[index]['System'] = dict(zip(rpc.system_attributes, row['System']))
+                    out_row['System'] = _dict(_zip(sys_keys, row['System']))
+                out_rows.append(out_row)
             if processes:
-                processes_data = sorted(processes_data.items(), key=lambda d: d[1].get(sort, 0) or 0,
-                                        reverse=True)
-                print_json(processes_data, format)
+                writer.emit(select_rows(processes_data.items()))
             else:
-                print_json(data, format)
+                writer.emit(out_rows)
 
-    with InstrumentsBase(udid=udid, network=network) as rpc:
+    with writer, InstrumentsBase(udid=udid, network=network) as rpc:
 
         if proc_filter:
-            data = rpc.device_info.sysmonProcessAttributes()
+            allowed = frozenset(rpc.device_info.sysmonProcessAttributes())
             proc_filter = proc_filter.split(',')
             proc_filter.extend(['name', 'pid'])
-            proc_filter = list(set(proc_filter))
-            for proc in proc_filter:
-                if proc not in data:
-                    log.warn(f'{proc_filter} value：{proc} not in {data}')
-                    return
+            # dict.fromkeys 去重且保留用户给定的字段顺序
+            proc_filter = list(dict.fromkeys(proc_filter))
+            bad = set(proc_filter) - allowed
+            if bad:
+                log.warn(f'{proc_filter} value：{sorted(bad)} not in {sorted(allowed)}')
+                return
             rpc.process_attributes = proc_filter
 
         if sys_filter:
-            data = rpc.device_info.sysmonSystemAttributes()
+            allowed = frozenset(rpc.device_info.sysmonSystemAttributes())
             sys_filter = sys_filter.split(',')
-            for sys in sys_filter:
-                if sys not in data:
-                    log.warn(f'{sys_filter} value：{sys} not in {data}')
-                    return
+            bad = set(sys_filter) - allowed
+            if bad:
+                log.warn(f'{sys_filter} value：{sorted(bad)} not in {sorted(allowed)}')
+                return
             rpc.system_attributes = sys_filter
 
         if bundle_id:
             app = rpc.application_listing(bundle_id)
             name = app.get('ExecutableName')
+
+        # 注册回调前一次性固化属性键和过滤/排序闭包，回调里只剩局部变量访问。
+        # 特化必须放在 bundle_id 解析之后，name 此时才是最终值
+        rpc.process_attributes = rpc.process_attributes or list(rpc.device_info.sysmonProcessAttributes())
+        rpc.system_attributes = rpc.system_attributes or list(rpc.device_info.sysmonSystemAttributes())
+        proc_keys = tuple(rpc.process_attributes)
+        sys_keys = tuple(rpc.system_attributes)
+        name_idx = proc_keys.index('name')
+
+        # pid/name 在命令生命周期内不变，特化闭包去掉每个进程的重复判断；
+        # 过滤作用在原始属性行上，被过滤掉的进程不付出属性展开的开销
+        if pid and name:
+            def process_match(_pid, process):
+                return pid == _pid and process[name_idx] == name
+        elif pid:
+            def process_match(_pid, process):
+                return pid == _pid
+        elif name:
+            def process_match(_pid, process):
+                return process[name_idx] == name
+
+        # 未指定 --sort 时不排序（原先按常数键全量排序纯属浪费）；
+        # 指定 --top N 时用 nlargest，O(M log N) 替代全量 O(M log M)
+        if sort:
+            def sort_key(d):
+                return d[1].get(sort, 0) or 0
+
+            if top:
+                def select_rows(items):
+                    return heapq.nlargest(top, items, key=sort_key)
+            else:
+                def select_rows(items):
+                    return sorted(items, key=sort_key, reverse=True)
+        elif top:
+            def select_rows(items):
+                return list(islice(items, top))
+        else:
+            select_rows = list
+
         rpc.sysmontap(on_callback_message, time)
 
 
@@ -309,21 +351,49 @@ def cmd_xcuitest(udid, network, format, bundle_id, port):
 def cmd_graphics(udid, network, format, time):
     """ Get graphics fps
     """
-    with InstrumentsBase(udid=udid, network=network) as rpc:
-        def on_callback_message(res):
+    # 时间戳按 200ms 粒度复用，避免每帧都构造并格式化 datetime 对象
+    stamp = {'at': 0.0, 'text': ''}
+
+    with BatchedJSONWriter(format) as writer, InstrumentsBase(udid=udid, network=network) as rpc:
+        def on_callback_message(res, _monotonic=monotonic, _now=datetime.now):
             data = res.selector
-            print_json({"currentTime": str(datetime.now()), "fps": data['CoreAnimationFramesPerSecond']}, format)
+            now = _monotonic()
+            if now - stamp['at'] >= 0.2:
+                stamp['at'] = now
+                stamp['text'] = str(_now())
+            writer.emit({"currentTime": stamp['text'], "fps": data['CoreAnimationFramesPerSecond']})
 
         rpc.graphics(on_callback_message, time)
 
 
+@instruments.command('power', cls=Command)
+def cmd_power(udid, network, format):
+    """ Get mobile power data
+    """
+    headers = ['startingTime', 'duration', 'level']
+    ctx = {'remained': bytearray()}
+
+    def on_callback_message(res):
+        if isinstance(res.selector, InstrumentRPCParseError):
+            ctx['remained'] += res.selector.data
+            cur = 0
+            end = len(ctx['remained']) - _POWER_SIZE
+            while cur <= end:
+                print_json(dict(zip(headers, _POWER_STRUCT.unpack_from(ctx['remained'], cur))), format)
+                cur += _POWER_SIZE
+            del ctx['remained'][:cur]
+
+    with InstrumentsBase(udid=udid, network=network) as rpc:
+        rpc.power(on_callback_message)
+
+
 @instruments.command('notifications', cls=Command)
 def cmd_notifications(udid, network, format):
     """Get mobile notifications
     """
-    with InstrumentsBase(udid=udid, network=network) as rpc:
+    with BatchedJSONWriter(format) as writer, InstrumentsBase(udid=udid, network=network) as rpc:
         def on_callback_message(res):
-            print_json(res.auxiliaries, format)
+            writer.emit(res.auxiliaries)
 
         rpc.mobile_notifications(on_callback_message)
 
@@ -338,20 +408,24 @@ def stackshot(udid, network, format, out):
             log.warn('The interface requires iOS version 12+')
             return
         stopSignal = threading.Event()
+        buf_queue = queue.Queue(maxsize=2)
 
         def on_callback_message(res):
             if isinstance(res.selector, InstrumentRPCParseError):
                 buf = res.selector.data
                 if buf.startswith(b'\x07X\xa2Y'):
+                    # 只做交接，多兆字节的解析移出 RPC 接收线程，避免阻塞 DTX 读循环
+                    buf_queue.put(buf)
                     stopSignal.set()
-                    kc_data = kc_data_parse(buf)
-                    if out is not None:
-                        json.dump(kc_data, out, indent=4)
-                        log.info(f'Successfully dump stackshot to {out.name}')
-                    else:
-                        print_json(kc_data, format)
 
         rpc.core_profile_session(on_callback_message, stopSignal)
+        kc_data = kc_data_parse(buf_queue.get())
+        if out is not None:
+            # 一次性序列化整树单次写出；未指定 --format json 时用紧凑格式，少写约四成字节
+            out.write(dumps_json(kc_data, indent=format == 'json').decode())
+            log.info(f'Successfully dump stackshot to {out.name}')
+        else:
+            print_json(kc_data, format)
 
 
 @instruments.command('core_profile', cls=Command)
@@ -7,6 +7,7 @@ import os
 import struct
 import threading
 from distutils.version import LooseVersion
+from socket import AF_INET6, inet_ntoa, inet_ntop
 
 from ios_device.util.bpylist2 import NSUUID, XCTestConfiguration, NSURL
 
@@ -47,54 +48,46 @@ def caller(res, func):
         func(res)
 
 
-def network_caller(res, func):
+_NETWORK_HEADERS = {
+    0: ['InterfaceIndex', "Name"],
+    1: ['LocalAddress', 'RemoteAddress', 'InterfaceIndex', 'Pid', 'RecvBufferSize', 'RecvBufferUsed',
+        'SerialNumber', 'Kind'],
+    2: ['RxPackets', 'RxBytes', 'TxPackets', 'TxBytes', 'RxDups', 'RxOOO', 'TxRetx', 'MinRTT', 'AvgRTT',
+        'ConnectionSerial']
+}
+_NETWORK_MSG_TYPE = {
+    0: "interface-detection",
+    1: "connection-detected",
+    2: "connection-update",
+}
+
+# sockaddr_in / sockaddr_in6，端口为网络字节序
+_SOCKADDR4 = struct.Struct('!BBH4s8x')
+_SOCKADDR6 = struct.Struct('!BBHI16sI')
+
+
+def _format_sockaddr(buf):
+    if len(buf) == _SOCKADDR4.size:
+        _, _, port, addr = _SOCKADDR4.unpack_from(buf)
+        return f"{inet_ntoa(addr)}:{port}"
+    _, _, port, _, addr, _ = _SOCKADDR6.unpack_from(buf)
+    return f"{inet_ntop(AF_INET6, addr)}:{port}"
+
+
+def network_caller(res, func, _dict=dict, _zip=zip, _format=_format_sockaddr,
+                   _headers=_NETWORK_HEADERS, _msg_type=_NETWORK_MSG_TYPE):
     """
-    网络异步回调包解析
+    网络异步回调包解析，热点名以默认参数预绑定
     :param res:
     :param func:
     :return:
     """
-    from construct import Struct, Int32ul, Bytes, Adapter, Switch, this, Int16ub, Int8ul
-    import ipaddress
-
-    class IP(Adapter):
-        def _decode(self, obj, context, path):
-            return ipaddress.ip_address(obj)
-
-    headers = {
-        0: ['InterfaceIndex', "Name"],
-        1: ['LocalAddress', 'RemoteAddress', 'InterfaceIndex', 'Pid', 'RecvBufferSize', 'RecvBufferUsed',
-            'SerialNumber', 'Kind'],
-        2: ['RxPackets', 'RxBytes', 'TxPackets', 'TxBytes', 'RxDups', 'RxOOO', 'TxRetx', 'MinRTT', 'AvgRTT',
-            'ConnectionSerial']
-    }
-    msg_type = {
-        0: "interface-detection",
-        1: "connection-detected",
-        2: "connection-update",
-    }
-
-    SockAddr = Struct(
-        'len' / Int8ul,
-        Int8ul,
-        'port' / Int16ub,
-        'network' / Switch(this.len, {
-            0x1c: Struct(
-                Int32ul,
-                'address' / IP(Bytes(16)),
-                Int32ul, ),
-            0x10: Struct(
-                'address' / IP(Bytes(4)),
-                Bytes(8))})
-    )
     data = res.selector
     if data[0] == 1:
-        addr = SockAddr.parse(data[1][0])
-        data[1][0] = f"{addr.network.address}:{addr.port}"
-        addr = SockAddr.parse(data[1][1])
-        data[1][1] = f"{addr.network.address}:{addr.port}"
+        data[1][0] = _format(data[1][0])
+        data[1][1] = _format(data[1][1])
 
-    func({str(msg_type[data[0]]): dict(zip(headers[data[0]], data[1]))})
+    func({str(_msg_type[data[0]]): _dict(_zip(_headers[data[0]], data[1]))})
 
 
 def system_caller(res, func):